@@ -128,3 +128,9 @@ def build_checkpoint_path(path: str, suffix: str) -> str:
 
 def build_checkpoint_uri(uri: str, suffix: str) -> str:
     return uri.removesuffix("/") + "/" + suffix.removeprefix("/")
+
+
+def to_empty_on(device: torch.device, module: torch.nn.Module) -> None:
+    """Allocates (uninitialized) storage on `device` for the parameters and buffers of `module` itself, e.g. as FSDP's
+    `param_init_fn` for a model instantiated on `meta` device."""
+    module.to_empty(device=device, recurse=False)
@@ -20,7 +20,7 @@ from transformers.models.llama.modeling_llama import LlamaDecoderLayer
 
 from s3torchconnector.dcp import S3StorageReader
 from s3torchbenchmarking.models import get_benchmark_model
-from s3torchbenchmarking.benchmark_utils import build_checkpoint_uri
+from s3torchbenchmarking.benchmark_utils import build_checkpoint_uri, to_empty_on
 
 logger = logging.getLogger(__name__)
 
@@ -50,12 +50,11 @@ def run_fsdp_load(
 ):
     if rank == 0:
         logger.info("Creating model")
+    # Weights are populated by the sharded checkpoint load: instantiate on `meta` device on every rank, instead of
+    # materializing them on rank=0 to broadcast them (see `load_benchmark.py`).
+    with torch.device("meta"):
         model_proxy = get_benchmark_model(model_name)
         model = model_proxy.model
-    else:
-        with torch.device("meta"):
-            model_proxy = get_benchmark_model(model_name)
-            model = model_proxy.model
 
     transformer_layer = LlamaDecoderLayer
     gpt_auto_wrap_policy = functools.partial(
@@ -66,15 +65,12 @@ def run_fsdp_load(
     if backend == "nccl":
         device_id = rank % torch.cuda.device_count()
         torch.cuda.set_device(device_id)
-        param_init_fn = lambda module: module.to_empty(
-            device=torch.device("cuda"), recurse=False
-        )
+        current_dev = torch.device("cuda", device_id)
     else:
         device_id = rank % torch.cpu.device_count()
         torch.cpu.set_device(device_id)
-        param_init_fn = lambda module: module.to_empty(
-            device=torch.device("cpu"), recurse=False
-        )
+        current_dev = torch.device("cpu")
+    param_init_fn = functools.partial(to_empty_on, current_dev)
 
     sharding_strategy = (
         ShardingStrategy.HYBRID_SHARD
@@ -85,15 +81,11 @@ def run_fsdp_load(
     model = FSDP(
         model,
         auto_wrap_policy=gpt_auto_wrap_policy,
-        device_id=(
-            torch.cuda.current_device()
-            if backend == "nccl"
-            else torch.cpu.current_device()
-        ),
+        device_id=current_dev,
         use_orig_params=False,
         sharding_strategy=sharding_strategy,
-        sync_module_states=True if backend == "nccl" else False,
-        param_init_fn=param_init_fn if rank != 0 else None,
+        sync_module_states=False,
+        param_init_fn=param_init_fn,
     )
 
     with FSDP.state_dict_type(model, StateDictType.SHARDED_STATE_DICT):
@@ -102,8 +94,8 @@ def run_fsdp_load(
     if rank == 0:
         print(f"Loading checkpoint with suffix: {suffix}")
 
-    start_load = perf_counter()
     storage_reader = get_reader(region, uri, suffix)
+    start_load = perf_counter()
     with FSDP.state_dict_type(model, StateDictType.SHARDED_STATE_DICT):
         dcp.load(state_dict, storage_reader=storage_reader)
     end_load = perf_counter()
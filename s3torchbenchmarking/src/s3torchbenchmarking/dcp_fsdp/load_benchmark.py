@@ -22,6 +22,7 @@ from transformers.models.llama.modeling_llama import LlamaDecoderLayer
 
 from s3torchbenchmarking.dcp_common import setup, benchmark_common_runner, get_reader
 from s3torchbenchmarking.models import get_benchmark_model
+from s3torchbenchmarking.benchmark_utils import to_empty_on
 
 Timestamps = Tuple[float, float]
 logger = logging.getLogger(__name__)
@@ -48,20 +49,13 @@ def run_fsdp_load(
     if rank == 0:
         logger.info("Creating Model")
 
-    # Instantiate model on CPU on rank=0 only to prevent CPU OOM
-    # (e.g. 70B * 4 bytes * 8 processes > 2T RAM available on P5)
-    if rank == 0:
+    # The weights are overwritten by the sharded checkpoint right after, so there is no need to materialize them on
+    # rank=0 and broadcast them (`sync_module_states=True`): instantiate the model on `meta` device on every rank,
+    # let `param_init_fn=...` allocate each rank's own shards, and DCP populate them.
+    # Note: non-persistent buffers are not part of the checkpoint, and are left uninitialized.
+    with torch.device("meta"):
         model_proxy = get_benchmark_model(cfg.model)
-        model = model_proxy.model
-    else:
-        with torch.device("meta"):
-            # Instantiating model on `meta` device doesn't consume CPU memory,
-            # but requires specifing `param_init_fn=...`
-            # and `sync_module_states=True` in FSDP c-tor.
-            model_proxy = get_benchmark_model(cfg.model)
-            model = model_proxy.model
-
-    model_size = model_proxy.size
+        model, model_size = model_proxy.model, model_proxy.size
 
     transformer_layer = LlamaDecoderLayer
     gpt_auto_wrap_policy = functools.partial(
@@ -74,15 +68,12 @@ def run_fsdp_load(
     if cfg.backend == "nccl":
         device_id = rank % torch.cuda.device_count()
         torch.cuda.set_device(device_id)
-        param_init_fn = lambda module: module.to_empty(
-            device=torch.device("cuda"), recurse=False
-        )
+        current_dev = torch.device("cuda", device_id)
     else:
         device_id = rank % torch.cpu.device_count()
         torch.cpu.set_device(device_id)
-        param_init_fn = lambda module: module.to_empty(
-            device=torch.device("cpu"), recurse=False
-        )
+        current_dev = torch.device("cpu")
+    param_init_fn = functools.partial(to_empty_on, current_dev)
 
     if cfg.checkpoint.sharding_strategy == "full":
         sharding_strategy = ShardingStrategy.FULL_SHARD
@@ -94,15 +85,11 @@ def run_fsdp_load(
     model = FSDP(
         model,
         auto_wrap_policy=gpt_auto_wrap_policy,
-        device_id=(
-            torch.cuda.current_device()
-            if cfg.backend == "nccl"
-            else torch.cpu.current_device()
-        ),
+        device_id=current_dev,
         use_orig_params=False,
         sharding_strategy=sharding_strategy,
-        sync_module_states=True if cfg.backend == "nccl" else False,
-        param_init_fn=param_init_fn if rank != 0 else None,
+        sync_module_states=False,
+        param_init_fn=param_init_fn,
     )
 
     if rank == 0:
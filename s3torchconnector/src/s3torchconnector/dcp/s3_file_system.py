@@ -6,11 +6,16 @@ import logging
 import os
 import pickle
 import queue
-import urllib.parse
+import random
+import threading
+import time
+import weakref
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Generator, Union, Optional, cast
+from typing import Dict, Generator, Union, Optional, Tuple, cast
 from typing import List
 from torch.futures import Future
 from torch.distributed.checkpoint.metadata import Metadata, StorageMeta
@@ -27,14 +32,6 @@ from torch.distributed.checkpoint.planner import (
 import torch
 import torch.distributed as dist
 from s3torchconnectorclient._mountpoint_s3_client import S3Exception
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    retry_if_exception_type,
-    before_sleep_log,
-    after_log,
-    wait_random_exponential,
-)
 from torch.distributed.checkpoint.filesystem import (
     FileSystemReader,
     FileSystemWriter,
@@ -45,7 +42,12 @@ from torch.distributed.checkpoint.planner import SavePlan
 
 from s3torchconnector._s3client import S3Client
 from s3torchconnector._s3dataset_common import parse_s3_uri
-from ..s3reader import S3ReaderConstructor, S3ReaderConstructorProtocol
+from ..s3reader import (
+    S3Reader,
+    S3ReaderConstructor,
+    S3ReaderConstructorProtocol,
+    SequentialS3Reader,
+)
 from .. import S3ClientConfig
 from .s3_prefix_strategy import S3PrefixStrategyBase, DefaultPrefixStrategy
 from .._user_agent import UserAgent
@@ -55,6 +57,24 @@ logger = logging.getLogger(__name__)
 _metadata_fn: str = ".metadata"
 DEFAULT_SUFFIX = ".distcp"
 
+_DELETE_MAX_ATTEMPTS = 3
+_DELETE_MAX_WAIT_S = 5
+
+_shared_clients_lock = threading.Lock()
+_shared_clients: "weakref.WeakValueDictionary[Tuple, S3Client]" = (
+    weakref.WeakValueDictionary()
+)
+
+# Maps each UTF-8 byte (decoded as latin-1) to itself if it is unreserved or '/', and to its percent-encoding
+# otherwise; equivalent to `urllib.parse.quote(segment, safe="")` applied to every path segment.
+_UNESCAPED_BYTES = frozenset(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~/"
+)
+_ESCAPE_TABLE = {
+    byte: chr(byte) if byte in _UNESCAPED_BYTES else f"%{byte:02X}"
+    for byte in range(256)
+}
+
 
 class S3FileSystem(FileSystemBase):
     def __init__(
@@ -81,18 +101,27 @@ class S3FileSystem(FileSystemBase):
         reader_type_string = S3ReaderConstructor.get_reader_type_string(
             self._reader_constructor
         )
-        user_agent = UserAgent(
-            ["dcp", torch.__version__, f"md/reader_type#{reader_type_string}"]
+        user_agent_comments = (
+            "dcp",
+            torch.__version__,
+            f"md/reader_type#{reader_type_string}",
         )
 
         self._client = (
-            S3Client(
-                region=region, user_agent=user_agent, s3client_config=s3client_config
+            _get_shared_client(
+                region, user_agent_comments, s3client_config or S3ClientConfig()
             )
             if s3_client is None
             else s3_client
         )
 
+        # Read-ahead state, see `S3FileSystem.read_ahead` (only sequential readers can be prefetched)
+        self._read_ahead_supported = reader_type_string == "sequential"
+        self._read_ahead_paths: List[str] = []
+        self._read_ahead_positions: Dict[str, int] = {}
+        self._read_ahead_count = 0
+        self._prefetched_readers: Dict[str, SequentialS3Reader] = {}
+
     @contextmanager
     def create_stream(
         self, path: Union[str, os.PathLike], mode: str
@@ -111,7 +140,7 @@ class S3FileSystem(FileSystemBase):
             ValueError: If the mode is not 'rb' or 'wb'.
         """
         path_str = _path_or_str_to_str(path)
-        bucket, key = parse_s3_uri(path_str)
+        bucket, key = _parse_s3_uri(path_str)
 
         if mode == "wb":  # write mode
             logger.debug("create_stream writable for %s", path_str)
@@ -119,15 +148,80 @@ class S3FileSystem(FileSystemBase):
                 yield stream
         elif mode == "rb":  # read mode
             logger.debug("create_stream readable for %s", path_str)
-            with self._client.get_object(
-                bucket, key, reader_constructor=self._reader_constructor
-            ) as stream:
+            reader: Optional[S3Reader] = self._prefetched_readers.pop(path_str, None)
+            if reader is None:
+                reader = self._client.get_object(
+                    bucket, key, reader_constructor=self._reader_constructor
+                )
+            with reader as stream:
+                self._prefetch_after(path_str)
                 yield stream
         else:
             raise ValueError(
                 f"Invalid {mode=} mode argument: create_stream only supports rb (read mode) & wb (write mode)"
             )
 
+    @contextmanager
+    def read_ahead(
+        self, paths: List[Union[str, os.PathLike]], count: int
+    ) -> Generator[None, None, None]:
+        """
+        Prefetch objects before they are opened for reading, when they are read in a known order.
+
+        Within this context, opening one of `paths` with :func:`create_stream` (in 'rb' mode) starts fetching the
+        `count` following paths, so that their data is already in flight by the time they are opened in turn. This
+        only applies to sequential readers: with other readers, the context has no effect.
+
+        Args:
+            paths (List[Union[str, os.PathLike]]): The S3 paths, in the order they are going to be opened.
+            count (int): Number of paths to prefetch ahead of the one being opened.
+        """
+        if not self._read_ahead_supported:
+            yield
+            return
+
+        self._read_ahead_paths = [_path_or_str_to_str(path) for path in paths]
+        self._read_ahead_positions = {
+            path: position for position, path in enumerate(self._read_ahead_paths)
+        }
+        self._read_ahead_count = count
+        try:
+            yield
+        finally:
+            self._read_ahead_paths = []
+            self._read_ahead_positions = {}
+            self._read_ahead_count = 0
+            # Close the prefetched readers which were not opened (e.g. after an error). `close` only marks them as
+            # closed: their GET streams are released when the readers are dropped, right after.
+            for reader in self._prefetched_readers.values():
+                reader.close()
+            self._prefetched_readers.clear()
+
+    def _prefetch_after(self, path_str: str) -> None:
+        position = self._read_ahead_positions.get(path_str)
+        if position is None:
+            return
+        next_paths = self._read_ahead_paths[
+            position + 1 : position + 1 + self._read_ahead_count
+        ]
+        for next_path in next_paths:
+            if next_path in self._prefetched_readers:
+                continue
+            bucket, key = _parse_s3_uri(next_path)
+            reader = cast(
+                SequentialS3Reader,
+                self._client.get_object(
+                    bucket, key, reader_constructor=self._reader_constructor
+                ),
+            )
+            try:
+                reader.prefetch()
+            except S3Exception as e:
+                # Not fatal: the object is fetched again, and the error reported, when it is opened
+                logger.debug("Failed to prefetch %s: %s", next_path, e)
+                continue
+            self._prefetched_readers[next_path] = reader
+
     def concat_path(self, path: Union[str, os.PathLike], suffix: str) -> str:
         """
         Concatenate a suffix to the given path.
@@ -139,7 +233,6 @@ class S3FileSystem(FileSystemBase):
         Returns:
             str: The concatenated path.
         """
-        logger.debug("concat paths %s and %s", path, suffix)
         path_str = os.fspath(path)
         result = os.path.join(path_str, suffix)
         return result
@@ -179,10 +272,10 @@ class S3FileSystem(FileSystemBase):
         old_path_str = _path_or_str_to_str(old_path)
         new_path_str = _path_or_str_to_str(new_path)
 
-        old_bucket, old_key = parse_s3_uri(old_path_str)
+        old_bucket, old_key = _parse_s3_uri(old_path_str)
         escaped_old_key = self._escape_path(old_key)
         logger.debug("rename: escaped version of the source key: %s", escaped_old_key)
-        new_bucket, new_key = parse_s3_uri(new_path_str)
+        new_bucket, new_key = _parse_s3_uri(new_path_str)
 
         if old_bucket != new_bucket:
             raise ValueError(
@@ -207,7 +300,7 @@ class S3FileSystem(FileSystemBase):
         logger.debug("exists %s", path)
 
         path_str = _path_or_str_to_str(path)
-        bucket, key = parse_s3_uri(path_str)
+        bucket, key = _parse_s3_uri(path_str)
         try:
             self._client.head_object(bucket, key)
         except S3Exception as e:
@@ -220,7 +313,7 @@ class S3FileSystem(FileSystemBase):
         logger.debug("remove %s", path)
 
         path_str = _path_or_str_to_str(path)
-        bucket, key = parse_s3_uri(path_str)
+        bucket, key = _parse_s3_uri(path_str)
         try:
             self._client.delete_object(bucket, key)
         except S3Exception:
@@ -234,29 +327,46 @@ class S3FileSystem(FileSystemBase):
             return True
 
         try:
-            parse_s3_uri(_path_or_str_to_str(checkpoint_id))
+            _parse_s3_uri(_path_or_str_to_str(checkpoint_id))
         except ValueError:
             return False
         return True
 
-    @retry(
-        retry=retry_if_exception_type(S3Exception),
-        stop=stop_after_attempt(3),
-        wait=wait_random_exponential(multiplier=1, max=5),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
-        after=after_log(logger, logging.ERROR),
-        reraise=True,
-    )
     def _delete_with_retry(self, bucket_name: str, old_key: str):
         """Wrapper around :func:`S3Client.delete_object` to retry the deletion.
 
-        Will retry a maximum of 3 times, only for `S3Exception`s, and wait between retries. It will reraise the caught
-        exception too, and logs retries and final error, if any."""
-        self._client.delete_object(bucket_name, old_key)
+        Will retry a maximum of 3 times, only for `S3Exception`s, and wait between retries (exponential backoff with
+        full jitter, capped at 5 seconds). It will reraise the caught exception too, and logs retries and final error,
+        if any."""
+        for attempt in range(1, _DELETE_MAX_ATTEMPTS + 1):
+            try:
+                self._client.delete_object(bucket_name, old_key)
+                return
+            except S3Exception as e:
+                if attempt == _DELETE_MAX_ATTEMPTS:
+                    logger.error(
+                        "Failed to delete s3://%s/%s after %d attempts: %s",
+                        bucket_name,
+                        old_key,
+                        attempt,
+                        e,
+                    )
+                    raise
+                wait = random.uniform(0, min(_DELETE_MAX_WAIT_S, 2 ** (attempt - 1)))
+                logger.warning(
+                    "Retrying deletion of s3://%s/%s in %.2f seconds (attempt %d of %d failed: %s)",
+                    bucket_name,
+                    old_key,
+                    wait,
+                    attempt,
+                    _DELETE_MAX_ATTEMPTS,
+                    e,
+                )
+                time.sleep(wait)
 
     @staticmethod
     def _escape_path(string):
-        """URL-encodes path segments while preserving '/' separators using urllib.parse.quote().
+        """URL-encodes path segments while preserving '/' separators, in a single pass over the UTF-8 bytes.
 
         Args:
             string (str): URL path string to escape
@@ -266,10 +376,7 @@ class S3FileSystem(FileSystemBase):
         """
         if not string:
             return string
-        parts = []
-        for part in string.split("/"):
-            parts.append(urllib.parse.quote(part, safe=""))
-        return "/".join(parts)
+        return string.encode("utf-8").decode("latin-1").translate(_ESCAPE_TABLE)
 
 
 @dataclass
@@ -300,6 +407,8 @@ class S3StorageWriter(FileSystemWriter):
             prefix_strategy (Optional[S3PrefixStrategyBase]): Optional strategy for generating S3 prefixes to
                 optimize checkpoint organization and prevent throttling.
             thread_count (int): Number of IO threads to use to write. Defaults to 1 (Pytorch Default)
+            num_copies (int): Number of copies of the checkpoint to write, each under its own `copy-{n}/` prefix.
+                Copies are uploaded concurrently, using `thread_count` threads per copy. Defaults to 1.
             kwargs (dict): Keyword arguments to pass to the parent :class:`FileSystemWriter`.
         """
         super().__init__(
@@ -339,38 +448,44 @@ class S3StorageWriter(FileSystemWriter):
             return super().write_data(plan, planner)
 
         storage_plan = plan.storage_data
-        file_count = 0
-
-        def gen_file():
-            nonlocal file_count
-            file_name = f"{storage_plan.prefix}{file_count}{DEFAULT_SUFFIX}"
-            file_count += 1
-            return file_name
+        if self.single_file_per_rank:
+            buckets = _split_by_size_and_type(self.thread_count, plan.items)
+        else:
+            buckets = [[item] for item in plan.items]
+        # File names are the same for every copy, only the `copy-{n}/` directory differs
+        file_names = [
+            f"{storage_plan.prefix}{file_count}{DEFAULT_SUFFIX}"
+            for file_count in range(len(buckets))
+        ]
 
-        file_queue: queue.Queue = queue.Queue()
+        # `_write_data` consumes a queue, but each one is only filled from this thread: append to the underlying deque
+        # rather than taking the queue lock on every `put`.
+        file_queues = []
         for copy in range(self.num_copies):
-            if self.single_file_per_rank:
-                for bucket in _split_by_size_and_type(self.thread_count, plan.items):
-                    file_name = gen_file()
-                    # Store just the copy prefix in the relative path
-                    relative_path = f"copy-{copy}/{file_name}"
-                    # Full path for the actual file
-                    full_path = self.fs.concat_path(self.path, relative_path)
-                    # Put the tuple in the queue with the correct relative path
-                    file_queue.put((full_path, file_name, bucket))
-                file_count = 0
-            else:
-                for item in plan.items:
-                    file_name = gen_file()
-                    # Store just the copy prefix in the relative path
-                    relative_path = f"copy-{copy}/{file_name}"
-                    # Full path for the actual file
-                    full_path = self.fs.concat_path(self.path, relative_path)
-                    # Put the tuple in the queue with the correct relative path
-                    file_queue.put((full_path, relative_path, [item]))
-                file_count = 0
-
-        return self._write_data(planner, file_queue)
+            file_queue: queue.Queue = queue.Queue()
+            for file_name, bucket in zip(file_names, buckets):
+                # Store just the copy prefix in the relative path
+                relative_path = f"copy-{copy}/{file_name}"
+                # Full path for the actual file
+                full_path = self.fs.concat_path(self.path, relative_path)
+                storage_key = file_name if self.single_file_per_rank else relative_path
+                file_queue.queue.append((full_path, storage_key, bucket))
+            file_queues.append(file_queue)
+
+        # Copies are independent uploads: write each one from its own queue, concurrently, so that every copy gets
+        # `thread_count` upload threads of its own (and the same tensor loading behaviour as a single copy).
+        with ThreadPoolExecutor(max_workers=self.num_copies) as executor:
+            copy_futures = [
+                executor.submit(self._write_data, planner, file_queue)
+                for file_queue in file_queues
+            ]
+            results: List[WriteResult] = []
+            for copy_future in copy_futures:
+                results += copy_future.result().wait()
+
+        fut: Future[List[WriteResult]] = Future()
+        fut.set_result(results)
+        return fut
 
     def finish(self, metadata: Metadata, results: List[List[WriteResult]]) -> None:
         """
@@ -398,21 +513,21 @@ class S3StorageWriter(FileSystemWriter):
         metadata.storage_meta.modules.append(f"num_copies={self.num_copies}")
 
         # Replace the storage_meta with our extended version
-        logging.debug("storage_data: updated METADATA %s", metadata.storage_meta)
+        logger.debug("storage_data: updated METADATA %s", metadata.storage_meta)
 
         tmp_path = cast(Path, self.fs.concat_path(self.path, f"{_metadata_fn}.tmp"))
+        # Serialize upfront so the metadata is uploaded with a single write, instead of one write per pickle frame.
+        # The format stays pickle, as `FileSystemReader.read_metadata` (and thus S3StorageReader) unpickles it.
+        metadata_bytes = pickle.dumps(metadata)
         with self.fs.create_stream(tmp_path, "wb") as metadata_file:
-            pickle.dump(metadata, metadata_file)
+            metadata_file.write(metadata_bytes)
             if self.sync_files:
                 try:
                     os.fsync(metadata_file.fileno())
                 except (AttributeError, io.UnsupportedOperation):
                     os.sync()
 
-        # delete in-case other checkpoints were present.
-        if self.fs.exists(self.metadata_path):
-            self.fs.rm_file(self.metadata_path)
-
+        # No need to delete a previous checkpoint's metadata first: the copy in `rename` overwrites it.
         self.fs.rename(tmp_path, self.metadata_path)
 
     @classmethod
@@ -427,6 +542,7 @@ class S3StorageReader(FileSystemReader):
         path: Union[str, os.PathLike],
         s3client_config: Optional[S3ClientConfig] = None,
         reader_constructor: Optional[S3ReaderConstructorProtocol] = None,
+        num_prefetch_files: int = 0,
     ) -> None:
         """
         Initialize an S3 reader for distributed checkpointing.
@@ -437,6 +553,9 @@ class S3StorageReader(FileSystemReader):
             s3client_config (Optional[S3ClientConfig]): Optional S3ClientConfig with parameters for S3 client.
             reader_constructor (Optional[S3ReaderConstructorProtocol]): Optional partial(S3Reader) created using S3ReaderConstructor
                 e.g. S3ReaderConstructor.sequential() or S3ReaderConstructor.range_based()
+            num_prefetch_files (int): Number of checkpoint files to start fetching ahead of the one being read, to hide
+                S3 first-byte latency (sequential reader only). Prefetched files are buffered in memory. Defaults to 0
+                (no prefetching).
         """
         super().__init__(path)
         self.fs = S3FileSystem(region, s3client_config=s3client_config, reader_constructor=reader_constructor)  # type: ignore
@@ -445,6 +564,7 @@ class S3StorageReader(FileSystemReader):
         self.num_copies = 1
         self.assigned_copy = None
         self.rank = None
+        self.num_prefetch_files = num_prefetch_files
 
     @classmethod
     def validate_checkpoint_id(cls, checkpoint_id: Union[str, os.PathLike]) -> bool:
@@ -468,10 +588,9 @@ class S3StorageReader(FileSystemReader):
         ):
             for module in metadata.storage_meta.modules:
                 if module.startswith("num_copies="):
-                    print("Contains metadata")
                     self.num_copies = int(module.split("=")[1])
                     break
-        logger.debug(f"Num of copies: {self.num_copies}")
+        logger.debug("Num of copies: %s", self.num_copies)
         return metadata
 
     def set_up_storage_reader(self, metadata, is_coordinator):
@@ -492,7 +611,7 @@ class S3StorageReader(FileSystemReader):
             self.assigned_copy = self.rank % self.num_copies
 
             logger.debug(
-                f"Worker rank {self.rank} assigned to copy {self.assigned_copy}"
+                "Worker rank %s assigned to copy %s", self.rank, self.assigned_copy
             )
 
     def read_data(self, plan: LoadPlan, planner: LoadPlanner) -> Future[None]:
@@ -505,33 +624,75 @@ class S3StorageReader(FileSystemReader):
         Returns:
             Future: Completes when reading operations is done
         """
-        logger.debug(
-            f"Rank {self.rank}: Reading data from assigned copy {self.assigned_copy}"
-        )
-        logger.debug(f"Number of copies: {self.num_copies}")
         if self.num_copies <= 1 or self.assigned_copy is None:
             logger.debug(
-                f"Using default path for reading: num_copies={self.num_copies}, assigned_copy={self.assigned_copy}"
+                "Rank %s: Using default path for reading: num_copies=%s, assigned_copy=%s",
+                self.rank,
+                self.num_copies,
+                self.assigned_copy,
             )
-            return super().read_data(plan, planner)
+            return self._read_data_with_prefetch(plan, planner)
 
         original_path = self.path
-        logger.debug(f"Rank {self.rank}: Original path for reading: {original_path}")
 
         try:
             copy_path = self.fs.concat_path(self.path, f"copy-{self.assigned_copy}")
-            logger.debug(f"Rank {self.rank}: Reading from copy path: {copy_path}")
+            logger.debug("Rank %s: Reading from copy path: %s", self.rank, copy_path)
             self.path = copy_path
-            return super().read_data(plan, planner)
+            return self._read_data_with_prefetch(plan, planner)
         except Exception as e:
             logger.error(
-                f"Rank {self.rank}: Error reading from copy {self.assigned_copy}: {e}"
+                "Rank %s: Error reading from copy %s: %s",
+                self.rank,
+                self.assigned_copy,
+                e,
             )
             raise
         finally:
-            logger.debug(f"Rank {self.rank}: Restoring original path: {original_path}")
             self.path = original_path
 
+    def _read_data_with_prefetch(
+        self, plan: LoadPlan, planner: LoadPlanner
+    ) -> Future[None]:
+        if self.num_prefetch_files <= 0:
+            return super().read_data(plan, planner)
+
+        # Same order as `FileSystemReader.read_data`, which opens the files in order of first appearance in the plan
+        relative_paths = dict.fromkeys(
+            self.storage_data[read_item.storage_index].relative_path
+            for read_item in plan.items
+        )
+        paths = [self.fs.concat_path(self.path, path) for path in relative_paths]
+        with cast(S3FileSystem, self.fs).read_ahead(paths, self.num_prefetch_files):
+            return super().read_data(plan, planner)
+
 
 def _path_or_str_to_str(path: Union[str, os.PathLike]) -> str:
     return path if isinstance(path, str) else str(path)
+
+
+def _get_shared_client(
+    region: str, user_agent_comments: Tuple[str, ...], s3client_config: S3ClientConfig
+) -> S3Client:
+    """S3 client shared by the :class:`S3FileSystem` instances of a process having the same configuration (e.g. a
+    storage writer and a storage reader), so that the underlying client and its connections are only set up once.
+
+    Clients are only referenced weakly: one is released as soon as no file system uses it anymore.
+    """
+    key = (region, user_agent_comments, s3client_config)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = S3Client(
+                region=region,
+                user_agent=UserAgent(list(user_agent_comments)),
+                s3client_config=s3client_config,
+            )
+            _shared_clients[key] = client
+        return client
+
+
+@lru_cache(maxsize=4096)
+def _parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """Cached :func:`parse_s3_uri`, as the same checkpoint paths are parsed repeatedly while saving and loading."""
+    return parse_s3_uri(uri)
@@ -39,12 +39,12 @@ class S3Writer(io.BufferedIOBase):
     def write(
         self,
         # Ignoring the type for this as we don't currently support the Buffer protocol
-        data: Union[bytes, memoryview],  # type: ignore
+        data: Union[bytes, bytearray, memoryview],  # type: ignore
     ) -> int:
         """Write bytes to S3 Object specified by bucket and key
 
         Args:
-            data (bytes | memoryview): bytes to write
+            data (bytes | bytearray | memoryview): bytes to write
 
         Returns:
             int: Number of bytes written
@@ -54,8 +54,11 @@ class S3Writer(io.BufferedIOBase):
             ValueError: If the writer is closed.
         """
         self._checkClosed()  # from python/cpython/Lib/_pyio.py
+        # The underlying stream only accepts `bytes`: other bytes-like objects are copied once here
         if isinstance(data, memoryview):
             data = data.tobytes()
+        elif isinstance(data, bytearray):
+            data = bytes(data)
         self.stream.write(data)
         self._position += len(data)
         return len(data)
@@ -1,11 +1,16 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  // SPDX-License-Identifier: BSD
 
+import gc
 import os
+import urllib.parse
+import weakref
 from pathlib import Path
 from typing import Union
 
 import pytest
+from hypothesis import given
+from hypothesis.strategies import text
 
 from s3torchconnector import S3ClientConfig
 from s3torchconnector.s3reader import (
@@ -129,7 +134,40 @@ def test_rename_raises_when_retries_fail(caplog):
         s3fs.rename(src_path, dst_path)
 
     assert str(excinfo.value) == "Custom exception; failed to delete (after retries)"
-    assert "this was the 3rd time calling it" in caplog.text
+    assert (
+        "Failed to delete s3://test-bucket/src_key.txt after 3 attempts" in caplog.text
+    )
+    assert caplog.text.count("Retrying deletion of s3://test-bucket/src_key.txt") == 2
+
+
+def test_rename_retries_deletion_on_transient_failure(monkeypatch):
+    src_key, src_data = ("src_key.txt", b"src data\n")
+    dst_key = "dst_key.txt"
+    src_path = _build_s3_uri(TEST_BUCKET, src_key)
+    dst_path = _build_s3_uri(TEST_BUCKET, dst_key)
+
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    mock_client.add_object(src_key, src_data)
+    delete_object = mock_client.delete_object
+    delete_attempts = []
+
+    def fail_first_delete(bucket, key):
+        delete_attempts.append(key)
+        if len(delete_attempts) == 1:
+            raise S3Exception("Transient failure")
+        delete_object(bucket, key)
+
+    mock_client.delete_object = fail_first_delete
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+    s3fs = S3FileSystem(TEST_REGION, mock_client)
+
+    s3fs.rename(src_path, dst_path)
+
+    assert delete_attempts == [src_key, src_key]
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 1
+    assert s3fs.exists(src_path) is False
+    assert s3fs.exists(dst_path) is True
 
 
 @pytest.mark.parametrize(
@@ -160,6 +198,14 @@ def test_escape_path(source_path, expected_path):
     assert S3FileSystem._escape_path(source_path) == expected_path
 
 
+@given(text())
+def test_escape_path_matches_urllib_quote_per_segment(source_path):
+    expected_path = "/".join(
+        urllib.parse.quote(part, safe="") for part in source_path.split("/")
+    )
+    assert S3FileSystem._escape_path(source_path) == expected_path
+
+
 @pytest.mark.skip(reason="method not implemented (no-op)")
 def test_mkdir():
     pass
@@ -251,6 +297,32 @@ def test_custom_config_file_for_writer_and_reader():
     assert s3fs._client._s3client_config.max_attempts == 10
 
 
+def test_s3filesystem_shares_client_for_same_configuration():
+    writer_fs = S3FileSystem(
+        TEST_REGION, s3client_config=S3ClientConfig(part_size=8000)
+    )
+    reader_fs = S3FileSystem(
+        TEST_REGION, s3client_config=S3ClientConfig(part_size=8000)
+    )
+    default_fs = S3FileSystem(TEST_REGION)
+    other_region_fs = S3FileSystem("us-west-2")
+
+    assert writer_fs._client is reader_fs._client
+    assert default_fs._client is S3FileSystem(TEST_REGION)._client
+    assert default_fs._client is not writer_fs._client
+    assert other_region_fs._client is not default_fs._client
+
+
+def test_s3filesystem_releases_shared_client_when_unused():
+    s3fs = S3FileSystem(TEST_REGION, s3client_config=S3ClientConfig(part_size=8000))
+    client_ref = weakref.ref(s3fs._client)
+
+    del s3fs
+    gc.collect()
+
+    assert client_ref() is None
+
+
 @pytest.mark.parametrize("checkpoint_id", ["foobar", "s3:///"])
 def test_validate_checkpoint_id_returns_false_when_path_is_invalid(checkpoint_id):
     assert S3FileSystem.validate_checkpoint_id(checkpoint_id) is False
@@ -312,5 +384,120 @@ def test_s3filesystem_reader_constructor_integration(
         assert data_again == TEST_DATA
 
 
+def test_read_ahead_prefetches_following_paths():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    paths = []
+    for i in range(4):
+        mock_client.add_object(f"key-{i}", f"data-{i}".encode())
+        paths.append(_build_s3_uri(TEST_BUCKET, f"key-{i}"))
+    s3fs = S3FileSystem(TEST_REGION, mock_client)
+
+    with s3fs.read_ahead(paths, count=2):
+        with s3fs.create_stream(paths[0], "rb") as reader:
+            assert set(s3fs._prefetched_readers) == set(paths[1:3])
+            assert reader.read() == b"data-0"
+
+        prefetched_reader = s3fs._prefetched_readers[paths[1]]
+        assert prefetched_reader._stream is not None
+        with s3fs.create_stream(paths[1], "rb") as reader:
+            assert reader is prefetched_reader
+            assert set(s3fs._prefetched_readers) == set(paths[2:4])
+            assert reader.read() == b"data-1"
+
+    assert s3fs._prefetched_readers == {}
+    with s3fs.create_stream(paths[2], "rb") as reader:
+        assert reader.read() == b"data-2"
+        assert s3fs._prefetched_readers == {}
+
+
+def test_read_ahead_closes_unused_prefetched_readers():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    paths = []
+    for i in range(3):
+        mock_client.add_object(f"key-{i}", f"data-{i}".encode())
+        paths.append(_build_s3_uri(TEST_BUCKET, f"key-{i}"))
+    s3fs = S3FileSystem(TEST_REGION, mock_client)
+
+    with pytest.raises(RuntimeError):
+        with s3fs.read_ahead(paths, count=2):
+            with s3fs.create_stream(paths[0], "rb") as reader:
+                prefetched_readers = list(s3fs._prefetched_readers.values())
+                raise RuntimeError("failed while reading")
+
+    assert len(prefetched_readers) == 2
+    assert all(reader.closed for reader in prefetched_readers)
+    assert s3fs._prefetched_readers == {}
+
+
+def test_read_ahead_defers_prefetch_errors_until_path_is_opened():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    mock_client.add_object("key-0", b"data-0")
+    mock_client.add_object("key-2", b"data-2")
+    paths = [
+        _build_s3_uri(TEST_BUCKET, key) for key in ("key-0", "missing-key", "key-2")
+    ]
+    s3fs = S3FileSystem(TEST_REGION, mock_client)
+
+    with s3fs.read_ahead(paths, count=2):
+        with s3fs.create_stream(paths[0], "rb") as reader:
+            assert set(s3fs._prefetched_readers) == {paths[2]}
+            assert reader.read() == b"data-0"
+
+        with pytest.raises(S3Exception):
+            with s3fs.create_stream(paths[1], "rb") as reader:
+                reader.read()
+
+        with s3fs.create_stream(paths[2], "rb") as reader:
+            assert reader.read() == b"data-2"
+
+
+def test_read_ahead_does_not_prefetch_with_range_based_reader():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    paths = []
+    for i in range(2):
+        mock_client.add_object(f"key-{i}", f"data-{i}".encode())
+        paths.append(_build_s3_uri(TEST_BUCKET, f"key-{i}"))
+    s3fs = S3FileSystem(
+        TEST_REGION,
+        mock_client,
+        reader_constructor=S3ReaderConstructor.range_based(),
+    )
+
+    with s3fs.read_ahead(paths, count=1):
+        for i, path in enumerate(paths):
+            with s3fs.create_stream(path, "rb") as reader:
+                assert s3fs._prefetched_readers == {}
+                assert reader.read() == f"data-{i}".encode()
+
+
+def test_read_ahead_does_not_create_extra_range_based_readers(monkeypatch):
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    paths = []
+    for i in range(10):
+        mock_client.add_object(f"key-{i}", f"data-{i}".encode())
+        paths.append(_build_s3_uri(TEST_BUCKET, f"key-{i}"))
+    s3fs = S3FileSystem(
+        TEST_REGION,
+        mock_client,
+        reader_constructor=S3ReaderConstructor.range_based(),
+    )
+
+    constructed_readers = []
+    ranged_reader_init = RangedS3Reader.__init__
+
+    def counting_init(self, *args, **kwargs):
+        constructed_readers.append(self)
+        ranged_reader_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(RangedS3Reader, "__init__", counting_init)
+
+    with s3fs.read_ahead(paths, count=4):
+        for i, path in enumerate(paths):
+            with s3fs.create_stream(path, "rb") as reader:
+                assert reader.read() == f"data-{i}".encode()
+
+    assert len(constructed_readers) == len(paths)
+
+
 def _build_s3_uri(bucket: str, key: str) -> str:
     return f"s3://{bucket}/{key}"
@@ -0,0 +1,74 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  // SPDX-License-Identifier: BSD
+
+import pytest
+import torch
+import torch.distributed.checkpoint as dcp
+
+from s3torchconnector._s3client import MockS3Client
+from s3torchconnector.dcp import S3StorageReader, S3StorageWriter
+
+TEST_REGION = "eu-east-1"
+TEST_BUCKET = "test-bucket"
+TEST_KEY = "test-checkpoint"
+TEST_PATH = f"s3://{TEST_BUCKET}/{TEST_KEY}"
+
+
+def _save_checkpoint(mock_client: MockS3Client, state_dict: dict) -> None:
+    storage_writer = S3StorageWriter(region=TEST_REGION, path=TEST_PATH, thread_count=4)
+    storage_writer.fs._client = mock_client
+    dcp.save(state_dict, storage_writer=storage_writer)
+
+
+@pytest.mark.parametrize("num_prefetch_files", [0, 1, 2, 8])
+def test_s3storage_reader_loads_checkpoint(num_prefetch_files):
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    state_dict = {f"tensor-{i}": torch.randn(16, 8) for i in range(8)}
+    _save_checkpoint(mock_client, state_dict)
+
+    storage_reader = S3StorageReader(
+        region=TEST_REGION, path=TEST_PATH, num_prefetch_files=num_prefetch_files
+    )
+    storage_reader.fs._client = mock_client
+
+    # Record when objects are opened and when their GET streams are started
+    events = []
+    get_object_stream = mock_client._get_object_stream
+    create_stream = storage_reader.fs.create_stream
+
+    def recording_get_object_stream(bucket, key, *args):
+        events.append(("get", key))
+        return get_object_stream(bucket, key, *args)
+
+    def recording_create_stream(path, mode):
+        if mode == "rb":
+            events.append(("open", path.rsplit(f"{TEST_BUCKET}/", 1)[1]))
+        return create_stream(path, mode)
+
+    mock_client._get_object_stream = recording_get_object_stream
+    storage_reader.fs.create_stream = recording_create_stream
+
+    loaded_state_dict = {name: torch.zeros(16, 8) for name in state_dict}
+    dcp.load(loaded_state_dict, storage_reader=storage_reader)
+
+    for name, tensor in state_dict.items():
+        assert torch.equal(loaded_state_dict[name], tensor)
+    assert storage_reader.fs._prefetched_readers == {}
+
+    opened = [key for event, key in events if event == "open"]
+    data_files = [key for key in opened if key.endswith(".distcp")]
+    assert len(data_files) == 4
+    # Every object is fetched exactly once, prefetched or not
+    assert sorted(key for event, key in events if event == "get") == sorted(opened)
+    # Prefetched objects are fetched before being opened
+    prefetched = [
+        key
+        for key in data_files
+        if events.index(("get", key)) < events.index(("open", key))
+    ]
+    assert prefetched == (data_files[1:] if num_prefetch_files > 0 else [])
+
+
+def test_s3storage_reader_num_prefetch_files_defaults_to_zero():
+    storage_reader = S3StorageReader(region=TEST_REGION, path=TEST_PATH)
+    assert storage_reader.num_prefetch_files == 0
@@ -1,8 +1,17 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  // SPDX-License-Identifier: BSD
 
+import pickle
+import threading
+
 import pytest
+from torch.futures import Future
+from torch.distributed.checkpoint.metadata import Metadata, MetadataIndex
+from torch.distributed.checkpoint.planner import SavePlan, WriteItem, WriteItemType
+
+from s3torchconnector._s3client import MockS3Client
 from s3torchconnector.dcp import S3StorageWriter
+from s3torchconnector.dcp.s3_file_system import StorageMetadata
 
 TEST_REGION = "eu-east-1"
 TEST_BUCKET = "test-bucket"
@@ -21,3 +30,127 @@ def test_s3storage_writer_thread_count(thread_count):
 def test_s3storage_writer_thread_count_defaults_to_one():
     storage_writer = S3StorageWriter(region=TEST_REGION, path=TEST_PATH)
     assert storage_writer.thread_count == 1
+
+
+def test_s3storage_writer_finish_writes_pickled_metadata():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    storage_writer = S3StorageWriter(region=TEST_REGION, path=TEST_PATH, num_copies=2)
+    storage_writer.fs._client = mock_client
+
+    storage_writer.finish(Metadata(state_dict_metadata={}), [])
+
+    assert not storage_writer.fs.exists(f"{TEST_PATH}/.metadata.tmp")
+    with storage_writer.fs.create_stream(storage_writer.metadata_path, "rb") as f:
+        metadata = pickle.load(f)
+    assert metadata.state_dict_metadata == {}
+    assert metadata.storage_data == {}
+    assert "num_copies=2" in metadata.storage_meta.modules
+
+
+def test_s3storage_writer_finish_overwrites_existing_metadata():
+    mock_client = MockS3Client(TEST_REGION, TEST_BUCKET)
+    mock_client.add_object(f"{TEST_KEY}/.metadata", b"stale metadata")
+    storage_writer = S3StorageWriter(region=TEST_REGION, path=TEST_PATH)
+    storage_writer.fs._client = mock_client
+
+    def fail_head_object(bucket, key):
+        raise AssertionError("finish should not issue HEAD requests")
+
+    mock_client.head_object = fail_head_object
+
+    storage_writer.finish(Metadata(state_dict_metadata={}), [])
+
+    with storage_writer.fs.create_stream(storage_writer.metadata_path, "rb") as f:
+        metadata = pickle.load(f)
+    assert metadata.state_dict_metadata == {}
+
+
+@pytest.mark.parametrize(
+    "single_file_per_rank,expected_storage_keys",
+    [
+        (True, ["__0_0.distcp", "__0_1.distcp"] * 2),
+        (
+            False,
+            [
+                "copy-0/__0_0.distcp",
+                "copy-0/__0_1.distcp",
+                "copy-1/__0_0.distcp",
+                "copy-1/__0_1.distcp",
+            ],
+        ),
+    ],
+)
+def test_s3storage_writer_write_data_queues_files_for_each_copy(
+    single_file_per_rank, expected_storage_keys
+):
+    storage_writer = S3StorageWriter(
+        region=TEST_REGION,
+        path=TEST_PATH,
+        thread_count=2,
+        num_copies=2,
+        single_file_per_rank=single_file_per_rank,
+    )
+    items = [
+        WriteItem(index=MetadataIndex(fqn), type=WriteItemType.BYTE_IO)
+        for fqn in ("a", "b")
+    ]
+    plan = SavePlan(items=items, storage_data=StorageMetadata("__0_"))
+
+    queued = []
+
+    def capture_write_data(planner, file_queue):
+        items = []
+        while not file_queue.empty():
+            items.append(file_queue.get_nowait())
+        queued.append(items)
+        fut = Future()
+        fut.set_result([])
+        return fut
+
+    storage_writer._write_data = capture_write_data
+    storage_writer.write_data(plan, planner=None)
+
+    # Each copy is written from its own queue, possibly concurrently
+    queued = [item for items in sorted(queued) for item in items]
+    assert [storage_key for _, storage_key, _ in queued] == expected_storage_keys
+    assert [full_path for full_path, _, _ in queued] == [
+        f"{TEST_PATH}/copy-{copy}/__0_{file_count}.distcp"
+        for copy in range(2)
+        for file_count in range(2)
+    ]
+    assert all(len(bucket) == 1 for _, _, bucket in queued)
+
+
+@pytest.mark.parametrize("thread_count,num_copies", [(1, 2), (2, 2), (4, 3)])
+def test_s3storage_writer_write_data_writes_copies_concurrently(
+    thread_count, num_copies
+):
+    storage_writer = S3StorageWriter(
+        region=TEST_REGION,
+        path=TEST_PATH,
+        thread_count=thread_count,
+        num_copies=num_copies,
+    )
+    items = [WriteItem(index=MetadataIndex("a"), type=WriteItemType.BYTE_IO)]
+    plan = SavePlan(items=items, storage_data=StorageMetadata("__0_"))
+
+    # Every copy has to be in flight at the same time for the barrier to be passed
+    all_copies_started = threading.Barrier(num_copies, timeout=5)
+    write_thread_counts = []
+
+    def capture_write_data(planner, file_queue):
+        all_copies_started.wait()
+        write_thread_counts.append(storage_writer.thread_count)
+        full_path, _, _ = file_queue.get_nowait()
+        fut = Future()
+        fut.set_result([full_path])
+        return fut
+
+    storage_writer._write_data = capture_write_data
+    results = storage_writer.write_data(plan, planner=None).wait()
+
+    assert write_thread_counts == [thread_count] * num_copies
+    assert sorted(results) == [
+        f"{TEST_PATH}/copy-{copy}/__0_0.distcp" for copy in range(num_copies)
+    ]
+    assert storage_writer.thread_count == thread_count
@@ -45,6 +45,24 @@ def test_s3writer_write(stream):
     MOCK_STREAM.write.assert_called_with(stream)
 
 
+@pytest.mark.parametrize(
+    "data",
+    [
+        bytearray(b"hello!"),
+        memoryview(b"hello!"),
+        memoryview(bytearray(b"__hello!__"))[2:-2],
+    ],
+)
+def test_s3writer_write_bytes_like(data):
+    MOCK_STREAM.reset_mock()
+
+    s3writer = S3Writer(MOCK_STREAM)
+    assert s3writer.write(data) == 6
+    assert s3writer.tell() == 6
+    MOCK_STREAM.write.assert_called_once_with(b"hello!")
+    assert type(MOCK_STREAM.write.call_args.args[0]) is bytes
+
+
 @given(bytestream_and_lengths())
 def test_s3writer_tell(stream_and_lengths: Tuple[List[bytes], List[int]]):
     with S3Writer(MOCK_STREAM) as s3writer, BytesIO() as bytewriter: